@@ -9,25 +9,52 @@ Improvements in this version:
     * Hash in env var WAYFINDING_ADMIN_PWHASH; login sets session['is_admin']=True
 - Secret key pulled from env (WAYFINDING_SECRET) or randomized at boot.
 - Basic file-locking for CSV read/write to avoid corruption with multiple workers.
-- make_map accepts an explicit graph and highlights start/end nodes.
+- The result page renders the map client-side with Leaflet; the server sends
+  only the route coordinates plus a cacheable GeoJSON background layer.
 """
 
 import os
 import csv
+import functools
+import hashlib
+import hmac
 import math
-import re
 import secrets
-from contextlib import contextmanager
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, nullcontext
 
 import fcntl
-import pandas as pd
+import numpy as np
 import networkx as nx
-import folium
+try:
+    # Optional: JIT the scalar haversine kernel when numba is installed.
+    from numba import njit
+except ImportError:
+    def njit(**_kwargs):
+        def wrap(f):
+            return f
+        return wrap
+
+from werkzeug.middleware.proxy_fix import ProxyFix
 from werkzeug.security import check_password_hash
 from flask import (
-    Flask, render_template_string, request, redirect, url_for, flash,
-    jsonify, abort, session
+    Flask, render_template, request, redirect, url_for, flash,
+    jsonify, abort, session, g
 )
+try:
+    # Optional: orjson speeds up jsonify and Jinja's |tojson severalfold.
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+except ImportError:
+    orjson = None
+try:
+    # Optional: gzip/brotli compression for the HTML and (Geo)JSON payloads.
+    from flask_compress import Compress
+except ImportError:
+    Compress = None
 
 # --------------------------------------------------------------------
 # Config / paths
@@ -43,141 +70,445 @@ SECRET = os.environ.get("WAYFINDING_SECRET") or secrets.token_hex(32)
 # Small utilities
 # --------------------------------------------------------------------
 @contextmanager
-def locked_file(path: str, mode: str):
+def locked_file(path: str, mode: str, durable: bool = True, exclusive: bool = False):
     """
     Open a file and acquire an advisory lock for the duration of the context.
-    Shared lock for reads ('r'), exclusive for writes/appends ('w','a').
+    Shared lock for reads ('r'), exclusive for writes/appends ('w','a') or
+    when exclusive=True (read-modify-replace flows must serialize even
+    though they open for read). If another worker os.replace()d the path
+    while we waited on the lock, we hold a lock on a dead inode; re-open
+    until the locked file and the path agree.
+    durable=False skips the fsync on close: callers whose data also lives in
+    the in-process graph cache can trade a disk flush for lower latency.
     """
-    f = open(path, mode, newline="")
-    try:
-        lock_mode = fcntl.LOCK_SH
-        if "w" in mode or "a" in mode or "+" in mode:
-            lock_mode = fcntl.LOCK_EX
+    lock_mode = fcntl.LOCK_SH
+    if exclusive or "w" in mode or "a" in mode or "+" in mode:
+        lock_mode = fcntl.LOCK_EX
+    while True:
+        f = open(path, mode, newline="")
         fcntl.flock(f.fileno(), lock_mode)
+        try:
+            if os.fstat(f.fileno()).st_ino == os.stat(path).st_ino:
+                break
+        except OSError:
+            pass  # path vanished mid-swap; fall through and retry
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        f.close()
+    try:
         yield f
     finally:
         try:
             if "w" in mode or "a" in mode or "+" in mode:
                 f.flush()
-                os.fsync(f.fileno())
+                if durable:
+                    os.fsync(f.fileno())
         finally:
             fcntl.flock(f.fileno(), fcntl.LOCK_UN)
             f.close()
 
 
+# Per-IP token bucket for login attempts: the KDF in check_password_hash is
+# deliberately slow, so uncapped wrong-password POSTs can starve the workers.
+_LOGIN_BUCKET = {}
+_LOGIN_BUCKET_MAX = 5.0
+_LOGIN_REFILL_PER_S = 1.0
+_LOGIN_BUCKET_CAP = 1024
+
+# sha256 of the correct admin password after the first KDF success; lets a
+# valid re-login skip the expensive hash check.
+_ADMIN_PW_SHA256 = None
+
+
+def _login_allowed(ip: str) -> bool:
+    """Refill 1 token/s up to a burst of 5; deduct one per attempt."""
+    now = time.monotonic()
+    if len(_LOGIN_BUCKET) > _LOGIN_BUCKET_CAP:
+        # Entries idle long enough to be fully refilled carry no state;
+        # dropping them bounds the dict against spoofed-address floods.
+        idle = _LOGIN_BUCKET_MAX / _LOGIN_REFILL_PER_S
+        for k in [k for k, (_, last) in _LOGIN_BUCKET.items() if now - last > idle]:
+            del _LOGIN_BUCKET[k]
+    tokens, last = _LOGIN_BUCKET.get(ip, (_LOGIN_BUCKET_MAX, now))
+    tokens = min(_LOGIN_BUCKET_MAX, tokens + (now - last) * _LOGIN_REFILL_PER_S)
+    if tokens < 1.0:
+        _LOGIN_BUCKET[ip] = (tokens, now)
+        return False
+    _LOGIN_BUCKET[ip] = (tokens - 1.0, now)
+    return True
+
+
+def _check_admin_password(pw: str) -> bool:
+    """check_password_hash with a compare_digest fast path for repeat logins."""
+    global _ADMIN_PW_SHA256
+    digest = hashlib.sha256(pw.encode()).digest()
+    if _ADMIN_PW_SHA256 is not None and hmac.compare_digest(digest, _ADMIN_PW_SHA256):
+        return True
+    if check_password_hash(ADMIN_PWHASH, pw):
+        _ADMIN_PW_SHA256 = digest
+        return True
+    return False
+
+
 def require_admin():
     """
-    Allow admin access if session['is_admin'] is True (after password login).
+    Allow admin access if the request's admin flag is set (after password login).
     If ADMIN_PWHASH is NOT configured, admin routes remain open (dev mode).
     """
-    if not ADMIN_PWHASH:
-        return
-    if session.get("is_admin"):
-        return
-    abort(403)
+    if ADMIN_PWHASH and not g.is_admin:
+        abort(403)
+
+
+def _is_cxx(n) -> bool:
+    """True if n is a cXX/cXXX connector label ('c' plus 2-3 digits)."""
+    return type(n) is str and len(n) in (3, 4) and n[0] == "c" and n[1:].isdecimal()
+
+
+# Hoisted constants and bound locals keep the pure-Python fallback free of
+# per-call attribute lookups; the JIT'd version compiles them away anyway.
+_DEG2RAD = math.pi / 180.0
+_2R = 2.0 * 6371000.0
+_SIN, _COS, _ASIN, _SQRT = math.sin, math.cos, math.asin, math.sqrt
+
+
+@njit(cache=True, fastmath=True)
+def _haversine_scalar(lat1, lon1, lat2, lon2):
+    dphi = (lat2 - lat1) * _DEG2RAD
+    dlam = (lon2 - lon1) * _DEG2RAD
+    s1 = _SIN(dphi * 0.5)
+    s2 = _SIN(dlam * 0.5)
+    a = s1 * s1 + _COS(lat1 * _DEG2RAD) * _COS(lat2 * _DEG2RAD) * s2 * s2
+    return _2R * _ASIN(_SQRT(a))
+
+
+# Warm the kernel at import so the one-time JIT compile (a no-op for the
+# pure-Python fallback) doesn't land in the first request.
+_haversine_scalar(0.0, 0.0, 0.0, 0.0)
 
 
 def haversine_m(lat1, lon1, lat2, lon2) -> float:
     """Great-circle distance in meters."""
-    R = 6371000.0
-    from math import radians, sin, cos, asin, sqrt
-    p1, p2 = radians(lat1), radians(lat2)
-    dphi = radians(lat2 - lat1)
-    dlambda = radians(lon2 - lon1)
-    a = sin(dphi / 2) ** 2 + cos(p1) * cos(p2) * sin(dlambda / 2) ** 2
-    return 2 * R * asin(sqrt(a))
-
-
-def clean_nodes_df(df: pd.DataFrame) -> pd.DataFrame:
-    """Trim strings, coerce lat/lon to numeric, drop invalid rows."""
-    for col in df.select_dtypes(include="object"):
-        df[col] = df[col].astype(str).str.strip()
-    # Coerce lat/lon to numeric and drop NaNs
-    df["lat"] = pd.to_numeric(df.get("lat"), errors="coerce")
-    df["lon"] = pd.to_numeric(df.get("lon"), errors="coerce")
-    df = df.dropna(subset=["label", "lat", "lon"])
-    return df
+    return float(_haversine_scalar(lat1, lon1, lat2, lon2))
+
+
+def _nearest_cxx(lat, lon):
+    """
+    Nearest connector label and its distance in meters, vectorized over the
+    cached coordinate arrays. The argmin runs on the haversine 'a' term,
+    which is monotonic in distance, so arcsin/sqrt happen once, not per row.
+    """
+    p1 = math.radians(lat)
+    p2 = np.radians(_GRAPH_CACHE["cxx_lats"])
+    dphi = p2 - p1
+    dlam = np.radians(_GRAPH_CACHE["cxx_lons"] - lon)
+    a = np.sin(dphi / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dlam / 2) ** 2
+    i = int(np.argmin(a))
+    return _GRAPH_CACHE["cxx_labels"][i], _2R * math.asin(math.sqrt(float(a[i])))
+
+
+def read_nodes(path: str) -> list:
+    """Parse nodes.csv into a list of dicts, skipping malformed rows."""
+    rows = []
+    with locked_file(path, "r") as f:
+        for row in csv.DictReader(f):
+            try:
+                # Interned labels share one string object across the graph,
+                # the cached sets and every path list built from them.
+                label = sys.intern((row["label"] or "").strip())
+                lat = float(row["lat"])
+                lon = float(row["lon"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if not label:
+                continue
+            level = sys.intern((row.get("level") or "ground").strip().lower())
+            rows.append({"label": label, "lat": lat, "lon": lon, "level": level})
+    return rows
+
+
+def read_edges(path: str) -> list:
+    """Parse edges.csv into a list of dicts, skipping malformed rows."""
+    rows = []
+    with locked_file(path, "r") as f:
+        for row in csv.DictReader(f):
+            try:
+                from_node = sys.intern((row["from"] or "").strip())
+                to_node = sys.intern((row["to"] or "").strip())
+                dist = float(row["distance"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if from_node and to_node:
+                rows.append({"from": from_node, "to": to_node, "distance": dist})
+    return rows
 
 
 # --------------------------------------------------------------------
 # Graph loading with light caching
 # --------------------------------------------------------------------
-_GRAPH_CACHE = {"nodes_mtime": None, "edges_mtime": None, "graph": None, "nodes_df": None}
+_GRAPH_CACHE = {
+    "nodes_sig": None,
+    "edges_sig": None,
+    "graph": None,
+    "node_rows": None,
+    "cxx_labels": None,   # list[str] of cXX/cXXX connector labels
+    "cxx_lats": None,     # np.ndarray aligned with cxx_labels
+    "cxx_lons": None,
+    "cxx_set": None,      # frozenset of the same labels for O(1) membership
+    "max_cxx_num": None,  # highest numeric suffix among connector labels
+    "centroid": None,     # (mean lat, mean lon) over all nodes with coords
+    "version": 0,         # bumped on every rebuild; keys the route LRU cache
+    "node_geom": None,    # list of (label, lat, lon, is_cxx)
+    "edge_geom": None,    # list of (u, v, u_lat, u_lon, v_lat, v_lon)
+    "lat_arr": None,      # float32 arrays over all nodes with coordinates
+    "lon_arr": None,
+    "labels": None,       # node labels aligned with lat_arr/lon_arr
+    "node_idx": None,     # label -> row index into the coordinate arrays
+    "cxx_mask": None,     # bool array marking connector rows
+    "edge_set": None,     # {frozenset((u, v))} for O(1) duplicate checks
+    "labels_lower": None,  # lowercased labels for O(1) uniqueness checks
+    "locations": None,    # sorted non-cXX labels for the index dropdowns
+    "h_cxx": None,        # mutable copy of the connector-induced subgraph
+    "graph_fc": None,     # FeatureCollection of nodes + edges for the API
+}
+
+
+_GRAPH_LOCK = threading.Lock()
+
+# Serializes the endpoint splice/unsplice on the shared connector subgraph;
+# request threads must not mutate h_cxx under each other's searches.
+_ROUTE_LOCK = threading.Lock()
+
+
+def _csv_sigs():
+    """
+    Snapshot an (mtime, size) signature per CSV with one os.stat each.
+    Including st_size catches same-mtime rewrites on coarse filesystem
+    timestamps; (0.0, -1) stands in for a missing file.
+    """
+    try:
+        st = os.stat(NODES_CSV)
+        nodes_sig = (st.st_mtime, st.st_size)
+    except FileNotFoundError:
+        nodes_sig = (0.0, -1)
+    try:
+        st = os.stat(EDGES_CSV)
+        edges_sig = (st.st_mtime, st.st_size)
+    except FileNotFoundError:
+        edges_sig = (0.0, -1)
+    return nodes_sig, edges_sig
+
+
+def _cache_is_fresh(cache, nodes_sig, edges_sig) -> bool:
+    return (
+        cache["graph"] is not None
+        and cache["nodes_sig"] == nodes_sig
+        and cache["edges_sig"] == edges_sig
+    )
 
 
 def load_graph(force: bool = False):
     """Build (or reuse) the NetworkX graph from CSVs."""
-    nodes_mtime = os.path.getmtime(NODES_CSV) if os.path.exists(NODES_CSV) else 0
-    edges_mtime = os.path.getmtime(EDGES_CSV) if os.path.exists(EDGES_CSV) else 0
+    nodes_sig, edges_sig = _csv_sigs()
 
     cache = _GRAPH_CACHE
-    if (
-        not force
-        and cache["graph"] is not None
-        and cache["nodes_mtime"] == nodes_mtime
-        and cache["edges_mtime"] == edges_mtime
-    ):
-        return cache["graph"], cache["nodes_df"]
-
-    with locked_file(NODES_CSV, "r") as nf:
-        nodes_df = clean_nodes_df(pd.read_csv(nf))
-    with locked_file(EDGES_CSV, "r") as ef:
-        edges_df = pd.read_csv(ef)
+    if not force and _cache_is_fresh(cache, nodes_sig, edges_sig):
+        return cache["graph"], cache["node_rows"]
+
+    with _GRAPH_LOCK:
+        return _rebuild_graph(force, nodes_sig, edges_sig)
+
+
+def _rebuild_graph(force, nodes_sig, edges_sig):
+    """Rebuild the cache under _GRAPH_LOCK (double-checked)."""
+    cache = _GRAPH_CACHE
+    # Another thread may have finished the rebuild while we waited
+    if not force and _cache_is_fresh(cache, nodes_sig, edges_sig):
+        return cache["graph"], cache["node_rows"]
+
+    node_rows = read_nodes(NODES_CSV)
+    edge_rows = read_edges(EDGES_CSV)
 
     G = nx.Graph()
+    G.add_nodes_from(
+        (r["label"], {"lat": r["lat"], "lon": r["lon"], "level": r["level"]}) for r in node_rows
+    )
+    # Edges (both endpoints must exist)
+    G.add_weighted_edges_from(
+        (r["from"], r["to"], r["distance"]) for r in edge_rows if r["from"] in G and r["to"] in G
+    )
 
-    # Nodes
-    for _, row in nodes_df.iterrows():
-        try:
-            label = str(row["label"]).strip()
-            lat = float(row["lat"])
-            lon = float(row["lon"])
-            level = str(row.get("level", "ground")).strip().lower()
-        except Exception as e:
-            print(f"[WARN] Skipping node due to bad data: {e}")
-            continue
-        G.add_node(label, lat=lat, lon=lon, level=level)
-
-    # Edges
-    for _, row in edges_df.iterrows():
-        try:
-            f = str(row["from"]).strip()
-            t = str(row["to"]).strip()
-            w = float(row["distance"])
-            if f in G.nodes and t in G.nodes:
-                G.add_edge(f, t, weight=w)
-        except Exception as e:
-            print(f"[WARN] Bad edge: {e}")
-            continue
+    _publish_cache(cache, G, node_rows, nodes_sig, edges_sig)
+    return G, node_rows
+
+
+def _publish_cache(cache, G, node_rows, nodes_sig, edges_sig):
+    """Recompute everything derived from G and publish it to the cache."""
+    # Flat geometry tuples so renders don't redo per-node dict lookups
+    node_geom = [
+        (n, d["lat"], d["lon"], _is_cxx(n))
+        for n, d in G.nodes(data=True)
+        if "lat" in d and "lon" in d
+    ]
+    edge_geom = [
+        (u, v, G.nodes[u]["lat"], G.nodes[u]["lon"], G.nodes[v]["lat"], G.nodes[v]["lon"])
+        for u, v in G.edges
+        if "lat" in G.nodes[u] and "lat" in G.nodes[v]
+    ]
+
+    # Structure-of-arrays coordinate storage with a label -> index map;
+    # the connector arrays for the nearest-cXX lookup are mask selections.
+    # float32 halves the footprint of the bulk map arrays but quantizes
+    # lat/lon to ~0.5-0.9 m at these longitudes, so the connector arrays —
+    # a few hundred elements feeding actual distance math — stay float64.
+    labels = [t[0] for t in node_geom]
+    node_idx = {l: i for i, l in enumerate(labels)}
+    lat64 = np.array([t[1] for t in node_geom], dtype=np.float64)
+    lon64 = np.array([t[2] for t in node_geom], dtype=np.float64)
+    lat_arr = lat64.astype(np.float32)
+    lon_arr = lon64.astype(np.float32)
+    cxx_mask = np.fromiter((t[3] for t in node_geom), dtype=bool, count=len(node_geom))
+    cxx_labels = [l for l, m in zip(labels, cxx_mask) if m]
+    cxx_lats = lat64[cxx_mask]
+    cxx_lons = lon64[cxx_mask]
+
+    # Carried on the graph itself so routing works on any graph handed to it
+    # (including the user-location splice) without rescanning node labels.
+    G.graph["cxx"] = frozenset(cxx_labels)
 
     cache.update(
-        {"graph": G, "nodes_df": nodes_df, "nodes_mtime": nodes_mtime, "edges_mtime": edges_mtime}
+        {
+            "graph": G,
+            "node_rows": node_rows,
+            "nodes_sig": nodes_sig,
+            "edges_sig": edges_sig,
+            "cxx_labels": cxx_labels,
+            "cxx_lats": cxx_lats,
+            "cxx_lons": cxx_lons,
+            "cxx_set": frozenset(cxx_labels),
+            "max_cxx_num": max((int(l[1:]) for l in cxx_labels), default=-1),
+            "centroid": (float(lat64.mean()), float(lon64.mean())) if lat64.size else None,
+            "version": cache["version"] + 1,
+            "node_geom": node_geom,
+            "edge_geom": edge_geom,
+            "lat_arr": lat_arr,
+            "lon_arr": lon_arr,
+            "labels": labels,
+            "node_idx": node_idx,
+            "cxx_mask": cxx_mask,
+            "edge_set": {frozenset((u, v)) for u, v in G.edges},
+            "labels_lower": {str(n).lower() for n in G.nodes},
+            "locations": sorted(n for n in G.nodes if not _is_cxx(n)),
+            "h_cxx": G.subgraph(G.graph["cxx"]).copy(),
+            "graph_fc": _graph_feature_collection(node_geom, edge_geom),
+        }
     )
-    return G, nodes_df
 
 
-# Global convenience (updated per request in index)
-G, nodes_df = load_graph(force=True)
+def _edges_feature_collection(edge_geom):
+    """All edges as one GeoJSON FeatureCollection (coordinates are lon, lat)."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {
+                    "type": "LineString",
+                    "coordinates": [
+                        [round(uo, 6), round(ul, 6)],
+                        [round(vo, 6), round(vl, 6)],
+                    ],
+                },
+                "properties": {"from": u, "to": v},
+            }
+            for u, v, ul, uo, vl, vo in edge_geom
+        ],
+    }
+
+
+def _graph_feature_collection(node_geom, edge_geom):
+    """Nodes and edges as one FeatureCollection for the graph API."""
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [round(lon, 6), round(lat, 6)]},
+            "properties": {"label": n, "cxx": is_cxx},
+        }
+        for n, lat, lon, is_cxx in node_geom
+    ]
+    features.extend(_edges_feature_collection(edge_geom)["features"])
+    return {"type": "FeatureCollection", "features": features}
+
+
+def _mutate_cached_graph(mutator):
+    """
+    Apply an in-place edit to the cached graph after its CSV write, refreshing
+    the derived structures without reparsing the CSVs. Falls back to a full
+    reload on the next request if nothing is cached yet.
+    """
+    with _GRAPH_LOCK:
+        cache = _GRAPH_CACHE
+        if cache["graph"] is None:
+            return
+        mutator(cache["graph"])
+        nodes_sig, edges_sig = _csv_sigs()
+        _publish_cache(cache, cache["graph"], cache["node_rows"], nodes_sig, edges_sig)
+
+
+# Build the cache at import so the first request on a fresh worker is warm
+load_graph(force=True)
 
 
 # --------------------------------------------------------------------
 # Routing
 # --------------------------------------------------------------------
-def shortest_path_via_cxx(start: str, end: str, graph=None):
-    """Route from start to end using only cXX/cXXX intermediates (start/end always allowed)."""
-    g = graph if graph is not None else G
-
-    def is_cxx(n: str) -> bool:
-        return bool(re.fullmatch(r"c\d{2,3}", str(n)))
+def _route_on(g, start: str, end: str):
+    """Uncached routing core: Dijkstra restricted to cXX intermediates."""
+    # An unknown endpoint is "no path", same as baseline: api_path turns
+    # this into its 404 and the form into a flash-and-redirect.
+    if start not in g or end not in g:
+        return None, [], 0.0
 
-    allowed = {start, end}
-    allowed.update([n for n in g.nodes if is_cxx(n)])
-    H = g.subgraph(allowed).copy()
+    # Search on the persistent connector subgraph; one is built ad hoc only
+    # when routing on a graph other than the cached one.
+    H = _GRAPH_CACHE["h_cxx"] if _GRAPH_CACHE["graph"] is g else None
+    shared = H is not None
+    if not shared:
+        cxx = g.graph.get("cxx")
+        if cxx is None:
+            cxx = frozenset(n for n in g.nodes if _is_cxx(n))
+        H = g.subgraph(cxx).copy()
+
+    # Splice the endpoints in with just their edges to allowed nodes —
+    # O(deg(start) + deg(end)) per query instead of an O(|V|) filter.
+    # The cached subgraph is shared across request threads and the splice
+    # mutates it, so splice+search+unsplice runs under _ROUTE_LOCK there;
+    # an ad hoc copy is request-local and needs no lock.
+    with _ROUTE_LOCK if shared else nullcontext():
+        spliced = [n for n in dict.fromkeys((start, end)) if n not in H]
+        try:
+            for n in spliced:
+                H.add_node(n, **g.nodes[n])
+            for n in spliced:
+                for nb, data in g[n].items():
+                    if nb in H:
+                        H.add_edge(n, nb, weight=data["weight"])
+            # A* with the great-circle distance to the goal: admissible because
+            # every edge weight is itself a haversine distance, and it expands a
+            # much smaller search front than blind Dijkstra.
+            goal = g.nodes[end]
+            goal_lat, goal_lon = goal["lat"], goal["lon"]
+            Hn = H.nodes
+
+            def heuristic(u, _v):
+                d = Hn[u]
+                return _haversine_scalar(d["lat"], d["lon"], goal_lat, goal_lon)
 
-    try:
-        nodes = nx.dijkstra_path(H, start, end, weight="weight")
-    except nx.NetworkXNoPath:
-        return None, [], 0.0
+            try:
+                nodes = nx.astar_path(H, start, end, heuristic=heuristic, weight="weight")
+            except nx.NetworkXNoPath:
+                return None, [], 0.0
+        finally:
+            for n in spliced:
+                H.remove_node(n)
 
     steps = []
     total = 0.0
@@ -188,108 +519,102 @@ def shortest_path_via_cxx(start: str, end: str, graph=None):
     return nodes, steps, total
 
 
-def make_map(path_nodes, graph=None):
-    """Render a folium map with background edges and an emphasized path."""
-    g = graph if graph is not None else G
+@functools.lru_cache(maxsize=4096)
+def _route_cached(start: str, end: str, version: int):
+    """Immutable route result for a given graph version (keys the LRU)."""
+    nodes, steps, total = _route_on(_GRAPH_CACHE["graph"], start, end)
+    return (tuple(nodes) if nodes is not None else None, tuple(steps), total)
 
-    lats = [g.nodes[n]["lat"] for n in g.nodes if "lat" in g.nodes[n]]
-    lons = [g.nodes[n]["lon"] for n in g.nodes if "lon" in g.nodes[n]]
-    if not lats or not lons:
-        m = folium.Map(location=[0, 0], zoom_start=2)
-    else:
-        m = folium.Map(location=[sum(lats) / len(lats), sum(lons) / len(lons)], zoom_start=17, tiles="OpenStreetMap")
-
-    path_set = set(path_nodes or [])
-    start_node = path_nodes[0] if path_nodes else None
-    end_node = path_nodes[-1] if path_nodes else None
-
-    # Draw all edges lightly
-    for u, v in g.edges:
-        if "lat" not in g.nodes[u] or "lon" not in g.nodes[u]:
-            continue
-        if "lat" not in g.nodes[v] or "lon" not in g.nodes[v]:
-            continue
-        folium.PolyLine(
-            [(g.nodes[u]["lat"], g.nodes[u]["lon"]), (g.nodes[v]["lat"], g.nodes[v]["lon"])],
-            color="#5ec7f8",
-            weight=2,
-            opacity=0.5,
-            tooltip=f"{u} \u2192 {v}",
-        ).add_to(m)
-
-    # Draw nodes: hide cXX nodes unless on the path; special colors for start/end
-    for n in g.nodes:
-        attrs = g.nodes[n]
-        if "lat" not in attrs or "lon" not in attrs:
-            continue
-        if re.fullmatch(r"c\d{2,3}", str(n)) and (not path_nodes or n not in path_set):
-            continue
-
-        # Special case: user location node
-        if n == "_user_location_":
-            folium.CircleMarker(
-                location=[attrs["lat"], attrs["lon"]],
-                radius=8,
-                popup="Your Location",
-                color="green",
-                fill=True,
-                fill_opacity=1,
-            ).add_to(m)
-            continue
-
-        color = "blue"
-        if path_nodes and n in path_set:
-            color = "red"
-        if start_node and n == start_node:
-            color = "green"
-        if end_node and n == end_node:
-            color = "#7e57c2"  # purple-ish
-
-        folium.CircleMarker(
-            location=[attrs["lat"], attrs["lon"]],
-            radius=4,
-            popup=str(n),
-            color=color,
-            fill=True,
-            fill_opacity=0.9,
-        ).add_to(m)
-
-    # Emphasize the route line
-    if path_nodes:
-        for u, v in zip(path_nodes[:-1], path_nodes[1:]):
-            if "lat" not in g.nodes[u] or "lon" not in g.nodes[u]:
-                continue
-            if "lat" not in g.nodes[v] or "lon" not in g.nodes[v]:
-                continue
-            folium.PolyLine(
-                [(g.nodes[u]["lat"], g.nodes[u]["lon"]), (g.nodes[v]["lat"], g.nodes[v]["lon"])],
-                color="red",
-                weight=5,
-                opacity=0.9,
-            ).add_to(m)
 
-    return m._repr_html_()
+def shortest_path_via_cxx(start: str, end: str, graph=None):
+    """Route from start to end using only cXX/cXXX intermediates (start/end always allowed)."""
+    g = graph if graph is not None else _GRAPH_CACHE["graph"]
+
+    # The user-location temp node changes coordinates per request, and the
+    # LRU is only valid for the cached graph — any other graph (or a route
+    # touching the temp node) bypasses it.
+    if start == "_user_location_" or end == "_user_location_" or g is not _GRAPH_CACHE["graph"]:
+        return _route_on(g, start, end)
+
+    nodes, steps, total = _route_cached(start, end, _GRAPH_CACHE["version"])
+    return (list(nodes) if nodes is not None else None, list(steps), total)
+
+
+def _route_points(g, path_nodes):
+    """Route coordinates for the client-side Leaflet overlay in result.html."""
+    return [
+        {"label": n, "lat": g.nodes[n]["lat"], "lon": g.nodes[n]["lon"]}
+        for n in path_nodes
+        if "lat" in g.nodes[n] and "lon" in g.nodes[n]
+    ]
+
+
+def _route_json(start, end, nodes, segments, total):
+    """JSON route payload shared by api_path and index's format=json mode."""
+    return jsonify(
+        {
+            "start": start,
+            "end": end,
+            "total_m": round(total, 1),
+            "nodes": list(nodes),
+            "segments": [{"text": t, "m": d} for t, d in segments],
+        }
+    )
 
 
 # --------------------------------------------------------------------
 # Flask app
 # --------------------------------------------------------------------
 app = Flask(__name__)
+# nginx.conf fronts the app with exactly one proxy hop that sets
+# X-Forwarded-For/-Proto; without this, remote_addr is always 127.0.0.1 and
+# the login rate limit collapses into a single shared bucket.
+app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
 app.secret_key = SECRET
 # Recommended cookie hardening (requires HTTPS for SECURE=True)
 app.config.update(
     SESSION_COOKIE_HTTPONLY=True,
     SESSION_COOKIE_SAMESITE="Lax",
-    SESSION_COOKIE_SECURE=False  # set True in production with HTTPS
+    SESSION_COOKIE_SECURE=False,  # set True in production with HTTPS
+    SEND_FILE_MAX_AGE_DEFAULT=3600,  # static assets are fine to cache for an hour
 )
+if Compress is not None:
+    app.config["COMPRESS_MIMETYPES"] = [
+        "text/html", "text/css", "application/javascript",
+        "application/json", "application/geo+json",
+    ]
+    Compress(app)
+# File templates compile once and stay cached; don't stat them per request
+app.jinja_env.auto_reload = False
+
+if orjson is not None:
+    class _OrjsonProvider(DefaultJSONProvider):
+        """Serialize jsonify/|tojson payloads through orjson."""
+
+        def dumps(self, obj, **kwargs):
+            option = orjson.OPT_SORT_KEYS if kwargs.get("sort_keys") else 0
+            return orjson.dumps(obj, option=option).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = _OrjsonProvider(app)
+
+
+@app.before_request
+def _load_admin_flag():
+    # Decode the signed session cookie once per request; require_admin and
+    # friends then read a plain attribute instead of re-verifying it.
+    g.is_admin = bool(session.get("is_admin"))
 
 
 @app.route("/wayfinding/", methods=["GET", "POST"])
 def index():
-    global G, nodes_df
-    G, nodes_df = load_graph()  # refresh if CSVs changed
-
     if request.method == "POST":
+        G, _ = load_graph()  # refresh if CSVs changed
+
+        # format=json skips the template rendering entirely
+        want_json = (request.form.get("format") or request.args.get("format") or "").lower() == "json"
         user_lat = request.form.get("user_lat")
         user_lon = request.form.get("user_lon")
         use_user_loc = user_lat and user_lon and user_lat.strip() != "" and user_lon.strip() != ""
@@ -308,38 +633,39 @@ def index():
                 user_lat = float(user_lat)
                 user_lon = float(user_lon)
 
-                # Find closest cXX/cXXX node
-                cxx_nodes = [n for n in G.nodes if re.fullmatch(r"c\d{2,3}", str(n))]
-                if not cxx_nodes:
+                # Find closest cXX/cXXX node (vectorized over cached coord arrays)
+                cxx_labels = _GRAPH_CACHE["cxx_labels"]
+                if not cxx_labels:
                     flash("No cXX/cXXX nodes available for routing.")
                     return redirect(url_for("index"))
 
-                closest = min(
-                    cxx_nodes,
-                    key=lambda n: haversine_m(user_lat, user_lon, G.nodes[n]["lat"], G.nodes[n]["lon"]),
-                )
-                dist = haversine_m(user_lat, user_lon, G.nodes[closest]["lat"], G.nodes[closest]["lon"])
+                closest, dist = _nearest_cxx(user_lat, user_lon)
 
+                # Compose the route instead of splicing a temp node into the
+                # shared graph (concurrent GPS queries would overwrite each
+                # other's coordinates): the temp node has exactly one edge,
+                # to the nearest connector, so its shortest path is that edge
+                # plus the closest → end route — which the LRU cache can serve.
                 temp_node = "_user_location_"
-                # Add temp node and edge just for this calculation
-                G.add_node(temp_node, lat=user_lat, lon=user_lon, level="ground")
-                G.add_edge(temp_node, closest, weight=dist)
-
-                # Route
-                path_nodes, segments, total = shortest_path_via_cxx(temp_node, end, graph=G)
-                if path_nodes is None:
-                    flash(f"No path found from your location to {end}.")
-                    return redirect(url_for("index"))
-
-                # Rewrite the first segment label instead of duplicating it
-                if segments and path_nodes and path_nodes[0] == temp_node and len(path_nodes) > 1:
-                    first_edge_dist = G[temp_node][path_nodes[1]]["weight"]
-                    segments[0] = (f"Your location → {path_nodes[1]} ({first_edge_dist:.1f} m)", first_edge_dist)
+                if closest == end:
+                    path_nodes, segments, total = [temp_node, end], [], dist
+                else:
+                    path_nodes, segments, total = shortest_path_via_cxx(closest, end)
+                    if path_nodes is None:
+                        flash(f"No path found from your location to {end}.")
+                        return redirect(url_for("index"))
+                    path_nodes = [temp_node] + path_nodes
+                    total += dist
+                segments.insert(0, (f"Your location → {closest} ({dist:.1f} m)", dist))
 
                 start_label = "Your Location"
-                map_html = make_map(path_nodes, graph=G)
-                return render_template_string(
-                    TEMPLATE_RESULT, start=start_label, end=end, segments=segments, total=total, map_html=map_html
+                if want_json:
+                    return _route_json(start_label, end, path_nodes, segments, total)
+                route = [{"label": temp_node, "lat": user_lat, "lon": user_lon}]
+                route.extend(_route_points(G, path_nodes[1:]))
+                return render_template(
+                    "result.html", start=start_label, end=end, segments=segments,
+                    total=total, route=route
                 )
             except Exception as e:
                 flash(f"Location error: {e}")
@@ -358,14 +684,18 @@ def index():
             flash(f"No path found between {start} and {end} (must use cXX or cXXX nodes as intermediates).")
             return redirect(url_for("index"))
 
-        map_html = make_map(path_nodes, graph=G)
-        return render_template_string(
-            TEMPLATE_RESULT, start=start, end=end, segments=segments, total=total, map_html=map_html
+        if want_json:
+            return _route_json(start, end, path_nodes, segments, total)
+        return render_template(
+            "result.html", start=start, end=end, segments=segments,
+            total=total, route=_route_points(G, path_nodes)
         )
 
-    # GET
-    locations = [n for n in sorted(G.nodes) if not re.fullmatch(r"c\d{2,3}", str(n))]
-    return render_template_string(TEMPLATE_FORM, locations=locations)
+    # GET — two os.stat calls verify the CSVs are unchanged (admin writes in
+    # another worker republish only that worker's cache); the common case
+    # still renders straight from the cached sorted list with no parse cost.
+    load_graph()
+    return render_template("form.html", locations=_GRAPH_CACHE["locations"])
 
 
 # --------------------- Admin login/logout ----------------------------
@@ -376,14 +706,16 @@ def admin_login():
         abort(403)
 
     if request.method == "POST":
+        if not _login_allowed(request.remote_addr or "-"):
+            abort(429)
         pw = (request.form.get("password") or "").strip()
-        if check_password_hash(ADMIN_PWHASH, pw):
+        if _check_admin_password(pw):
             session["is_admin"] = True
             flash("Admin unlocked.")
             return redirect(url_for("add_node"))
         else:
             flash("Invalid password.")
-    return render_template_string(TEMPLATE_ADMIN_LOGIN)
+    return render_template("admin_login.html")
 
 
 @app.route("/wayfinding/logout")
@@ -397,37 +729,13 @@ def admin_logout():
 @app.route("/wayfinding/add_node")
 def add_node():
     require_admin()
-    G_now, nodes_now = load_graph()
+    load_graph()
 
-    nodes = []
-    for n in G_now.nodes:
-        attrs = G_now.nodes[n]
-        try:
-            lat = float(attrs["lat"])
-            lon = float(attrs["lon"])
-            nodes.append(dict(label=n, lat=lat, lon=lon))
-        except Exception as e:
-            print(f"Skipping node {n} due to error: {e}")
-
-    # Suggest next c### label
-    existing = clean_nodes_df(pd.read_csv(NODES_CSV))
-    c_nodes = [str(r) for r in existing["label"] if re.fullmatch(r"c\d{2,3}", str(r))]
-    if c_nodes:
-        max_num = max(int(s[1:]) for s in c_nodes)
-    else:
-        max_num = -1
-    next_label = f"c{max_num + 1:03d}"
-
-    edges = []
-    for u, v in G_now.edges:
-        try:
-            u_lat, u_lon = G_now.nodes[u]["lat"], G_now.nodes[u]["lon"]
-            v_lat, v_lon = G_now.nodes[v]["lat"], G_now.nodes[v]["lon"]
-            edges.append({"from": u, "to": v, "u_lat": u_lat, "u_lon": u_lon, "v_lat": v_lat, "v_lon": v_lon})
-        except Exception:
-            continue
-
-    return render_template_string(TEMPLATE_ADD_NODE, nodes=nodes, next_label=next_label, edges=edges)
+    # The page is a static shell: node/edge data comes from the cached
+    # GeoJSON endpoint, so only the label suggestion and center go inline.
+    next_label = f"c{_GRAPH_CACHE['max_cxx_num'] + 1:03d}"
+    centroid = _GRAPH_CACHE["centroid"] or (0.0, 0.0)
+    return render_template("add_node.html", next_label=next_label, centroid=centroid)
 
 
 @app.route("/wayfinding/api/add_node", methods=["POST"])
@@ -446,18 +754,21 @@ def api_add_node():
     if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
         return jsonify({"error": "Lat/lon out of bounds"}), 400
 
-    # Enforce unique labels
-    with locked_file(NODES_CSV, "r") as f:
-        df = clean_nodes_df(pd.read_csv(f))
-    if any(str(x).strip().lower() == label.lower() for x in df["label"]):
+    # Enforce unique labels (O(1) against the cached lowercased set)
+    load_graph()
+    if label.lower() in _GRAPH_CACHE["labels_lower"]:
         return jsonify({"error": "Label already exists"}), 400
 
-    with locked_file(NODES_CSV, "a") as f:
+    with locked_file(NODES_CSV, "a", durable=False) as f:
         writer = csv.writer(f)
         writer.writerow([label, lat, lon, "ground"])
 
-    # Invalidate cache
-    _GRAPH_CACHE["graph"] = None
+    # Splice the new node into the warm cache instead of forcing a reparse
+    def _add(g):
+        g.add_node(label, lat=lat, lon=lon, level="ground")
+        _GRAPH_CACHE["node_rows"].append({"label": label, "lat": lat, "lon": lon, "level": "ground"})
+
+    _mutate_cached_graph(_add)
     return jsonify({"label": label, "lat": lat, "lon": lon})
 
 
@@ -471,40 +782,26 @@ def api_add_edge():
     if not from_node or not to_node or from_node == to_node:
         return jsonify({"error": "Invalid edge."}), 400
 
-    # Load nodes and ensure both exist
-    with locked_file(NODES_CSV, "r") as f:
-        nodes_df = clean_nodes_df(pd.read_csv(f))
-    nodes_df["label"] = nodes_df["label"].astype(str).str.strip()
-    node_lookup = {
-        r["label"]: (float(r["lat"]), float(r["lon"]))
-        for _, r in nodes_df.iterrows()
-        if r.get("lat") == r.get("lat") and r.get("lon") == r.get("lon")
-    }
-
-    if from_node not in node_lookup or to_node not in node_lookup:
+    # Both endpoints must already exist in the cached graph
+    G_now, _ = load_graph()
+    if from_node not in G_now or to_node not in G_now:
         return jsonify({"error": "Unknown node(s). Save nodes first."}), 400
 
-    # Deduplicate (both directions)
-    with locked_file(EDGES_CSV, "r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row or row[0] == "from":
-                continue
-            if len(row) >= 2:
-                a, b = row[0].strip(), row[1].strip()
-                if {a, b} == {from_node, to_node}:
-                    return jsonify({"error": "Edge already exists."}), 200
+    # Deduplicate (both directions) against the cached edge set
+    if frozenset((from_node, to_node)) in _GRAPH_CACHE["edge_set"]:
+        return jsonify({"error": "Edge already exists."}), 200
 
     # Compute authoritative distance on server
-    (lat1, lon1), (lat2, lon2) = node_lookup[from_node], node_lookup[to_node]
+    lat1, lon1 = G_now.nodes[from_node]["lat"], G_now.nodes[from_node]["lon"]
+    lat2, lon2 = G_now.nodes[to_node]["lat"], G_now.nodes[to_node]["lon"]
     dist = round(haversine_m(lat1, lon1, lat2, lon2), 1)
 
-    with locked_file(EDGES_CSV, "a") as f:
+    with locked_file(EDGES_CSV, "a", durable=False) as f:
         writer = csv.writer(f)
         writer.writerow([from_node, to_node, dist])
 
-    # Invalidate cache
-    _GRAPH_CACHE["graph"] = None
+    # Splice the new edge into the warm cache instead of forcing a reparse
+    _mutate_cached_graph(lambda g: g.add_edge(from_node, to_node, weight=dist))
     return jsonify({"result": f"Edge saved ({dist} m)."})
 
 
@@ -517,36 +814,64 @@ def api_delete_edge():
     if not from_node or not to_node:
         return jsonify({"error": "Missing edge data"}), 400
 
-    new_rows = []
-    found = False
-    with locked_file(EDGES_CSV, "r") as f:
-        reader = csv.reader(f)
-        for row in reader:
-            if not row:
-                continue
-            if row[0] == "from":
-                new_rows.append(row)
-                continue
-            if len(row) < 2:
-                continue
-            a, b = row[0].strip(), row[1].strip()
-            if {a, b} == {from_node, to_node}:
-                found = True
-                continue
-            new_rows.append(row)
+    # O(1) miss check against the cached edge set before touching the file
+    load_graph()
+    if frozenset((from_node, to_node)) not in _GRAPH_CACHE["edge_set"]:
+        return jsonify({"error": "Edge not found"}), 404
 
-    with locked_file(EDGES_CSV, "w") as f:
-        writer = csv.writer(f)
-        writer.writerows(new_rows)
+    # Stream-filter into a tempfile and atomically swap it in, so readers
+    # holding the shared lock never see a half-written file. The exclusive
+    # lock spans the read AND the swap: with a shared lock, two concurrent
+    # deletes would each rewrite from the same snapshot and the second
+    # os.replace would silently resurrect the first delete's edge.
+    found = False
+    target = {from_node, to_node}
+    fd, tmp_path = tempfile.mkstemp(dir=BASE_DIR, suffix=".csv")
+    with locked_file(EDGES_CSV, "r", exclusive=True) as src:
+        with os.fdopen(fd, "w", newline="") as dst:
+            writer = csv.writer(dst)
+            for row in csv.reader(src):
+                if not row:
+                    continue
+                if row[0] == "from":
+                    writer.writerow(row)
+                    continue
+                if len(row) < 2:
+                    continue
+                if {row[0].strip(), row[1].strip()} == target:
+                    found = True
+                    continue
+                writer.writerow(row)
+        if found:
+            os.replace(tmp_path, EDGES_CSV)  # atomic on POSIX
 
-    # Invalidate cache
-    _GRAPH_CACHE["graph"] = None
     if found:
+        # Drop the edge from the warm cache instead of forcing a reparse
+        def _drop(g):
+            if g.has_edge(from_node, to_node):
+                g.remove_edge(from_node, to_node)
+
+        _mutate_cached_graph(_drop)
         return jsonify({"result": "Deleted"})
     else:
+        os.remove(tmp_path)
         return jsonify({"error": "Edge not found"}), 404
 
 
+# Whole-graph GeoJSON: browser/CDN-cacheable, revalidated via mtime ETag
+@app.route("/wayfinding/api/graph.geojson", methods=["GET"])
+def api_graph_geojson():
+    load_graph()
+    cache = _GRAPH_CACHE
+    resp = jsonify(cache["graph_fc"])
+    resp.mimetype = "application/geo+json"
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 300
+    nsig, esig = cache["nodes_sig"], cache["edges_sig"]
+    resp.set_etag(f"{nsig[0]}-{nsig[1]}-{esig[0]}-{esig[1]}")
+    return resp.make_conditional(request)
+
+
 # Optional: simple JSON path API (useful for mobile or automation)
 @app.route("/wayfinding/api/path", methods=["GET"])
 def api_path():
@@ -554,611 +879,17 @@ def api_path():
     end = (request.args.get("end") or "").strip()
     if not start or not end:
         return jsonify({"error": "start and end required"}), 400
-    G_now, _ = load_graph()
-    nodes, segments, total = shortest_path_via_cxx(start, end, graph=G_now)
+    load_graph()
+    nodes, segments, total = shortest_path_via_cxx(start, end)
     if nodes is None:
         return jsonify({"error": "no_path"}), 404
-    return jsonify(
-        {
-            "start": start,
-            "end": end,
-            "total_m": round(total, 1),
-            "nodes": nodes,
-            "segments": [{"text": t, "m": d} for t, d in segments],
-        }
-    )
-
-
-# --------------------------------------------------------------------
-# Templates
-# --------------------------------------------------------------------
-TEMPLATE_FORM = """
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <title>Gallaudet Way-finding</title>
-  <meta name="viewport" content="width=device-width, initial-scale=1.0">
-  <style>
-    body {
-      font-family: Arial, Helvetica, sans-serif;
-      margin: 0;
-      padding: 0;
-      background: #f7f9fc;
-    }
-    .container {
-      max-width: 450px;
-      margin: 0 auto;
-      padding: 1em;
-      background: #fff;
-      box-shadow: 0 2px 12px #0001;
-      border-radius: 1em;
-      margin-top: 2em;
-    }
-    h1 {
-      font-size: 2em;
-      margin-bottom: .7em;
-      text-align: center;
-    }
-    label {
-      font-weight: 600;
-      display: block;
-      margin-bottom: .2em;
-      margin-top: 1.2em;
-    }
-    select, option {
-      width: 100%;
-      min-width: 0;
-      font-size: 1.2em;
-      padding: .7em;
-      margin-top: .2em;
-      margin-bottom: 1em;
-      border: 1px solid #bbb;
-      border-radius: .5em;
-      background: #f7f9fc;
-      box-sizing: border-box;
-    }
-    #use-location-btn, #find-route-btn {
-      width: 100%;
-      font-size: 1.2em;
-      padding: .7em;
-      background: #0077cc;
-      color: #fff;
-      border: none;
-      border-radius: .5em;
-      margin-top: .2em;
-      margin-bottom: 1em;
-      cursor: pointer;
-      transition: background .18s;
-    }
-    #use-location-btn:active,
-    #use-location-btn:focus,
-    #find-route-btn:active,
-    #find-route-btn:focus {
-      background: #005fa3;
-    }
-    .msg {
-      color: #c00;
-      margin: .7em 0;
-      text-align: center;
-      font-size: 1.08em;
-    }
-    #location-status {
-      font-size: 1em;
-      display: block;
-      margin-bottom: .7em;
-      text-align: center.
-    }
-    .admin-link {
-      display: block;
-      text-align: center;
-      margin-top: 1.7em;
-      font-size: 1em;
-    }
-    @media (max-width: 600px) {
-      .container {
-        max-width: 100vw;
-        box-shadow: none;
-        border-radius: 0;
-        margin-top: 0;
-        padding: 0.8em;
-      }
-      h1 { font-size: 1.3em; }
-      select, option, #use-location-btn, #find-route-btn { font-size: 1em; }
-    }
-  </style>
-</head>
-<body>
-  <div class="container">
-    <h1>Shortest walking route on campus</h1>
-
-    {% with messages = get_flashed_messages() %}
-      {% if messages %}
-        {% for m in messages %}
-          <div class="msg">{{m}}</div>
-        {% endfor %}
-      {% endif %}
-    {% endwith %}
-
-    <form method="post">
-      <input type="hidden" name="user_lat" id="user_lat">
-      <input type="hidden" name="user_lon" id="user_lon">
-
-      <label for="start">Start:</label>
-      <select name="start" id="start">
-        <option value="">-- Select --</option>
-        {% for loc in locations %}
-          <option value="{{loc}}">{{loc}}</option>
-        {% endfor %}
-      </select>
-
-      <button type="button" id="use-location-btn">Or use my location</button>
-      <span id="location-status"></span>
-      <div style="margin-bottom: 1em; color:#333; font-size:.98em;">
-        Note: GPS locations are not stored in the app. They are used only to build the route or show your location on the map.
-      </div>
-
-      <label for="end">End:</label>
-      <select name="end" id="end">
-        {% for loc in locations %}
-          <option value="{{loc}}">{{loc}}</option>
-        {% endfor %}
-      </select>
-
-      <button type="submit" id="find-route-btn">Find route</button>
-    </form>
-
-    <a class="admin-link" href="{{ url_for('admin_login') }}">
-      Or add new node or edges (admin feature)
-    </a>
-  </div>
-  <script>
-    document.getElementById('use-location-btn').onclick = function() {
-      var status = document.getElementById('location-status');
-      status.textContent = "Requesting location…";
-      if (!navigator.geolocation) {
-        status.textContent = "Geolocation not supported.";
-        return;
-      }
-      navigator.geolocation.getCurrentPosition(function(pos) {
-        var lat = pos.coords.latitude;
-        var lon = pos.coords.longitude;
-        document.getElementById('user_lat').value = lat;
-        document.getElementById('user_lon').value = lon;
-        status.innerHTML =
-          '<b>Location set:</b><br>' +
-          '<span style="color:green">' +
-          'label: <code>_user_location_</code><br>' +
-          'lat: <code>' + lat.toFixed(6) + '</code><br>' +
-          'lon: <code>' + lon.toFixed(6) + '</code><br>' +
-          'level: <code>ground</code></span>';
-        document.getElementById('start').value = '';
-      }, function(err) {
-        status.textContent = "Unable to get location.";
-      }, {enableHighAccuracy:true});
-    };
-  </script>
-</body>
-</html>
-"""
-
-TEMPLATE_RESULT = """
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <title>Route: {{start}} ➜ {{end}}</title>
-  <style>
-    body{font-family:Arial,Helvetica,sans-serif;margin:1rem}
-    ul{margin-top:.5rem}
-    li{margin-bottom:.3rem}
-    #map{margin-top:1rem}
-    a{margin-top:1rem;display:inline-block}
-    .controls{margin:.5rem 0 1rem; display:flex; gap:.5rem; align-items:center; flex-wrap:wrap}
-    .btn{background:#0077cc;color:#fff;border:none;border-radius:.5em;padding:.5rem .8rem;cursor:pointer}
-    .btn:focus,.btn:active{background:#005fa3}
-    .muted{color:#666;font-size:.9rem}
-  </style>
-</head>
-<body>
-  <h2>Route: {{start}} ➜ {{end}}</h2>
-  <strong>Total distance: {{'%.1f'|format(total)}} m</strong>
-  <ul>
-    {% for line, dist in segments %}
-      <li>{{line}}</li>
-    {% endfor %}
-  </ul>
-
-  <div class="controls">
-    <button id="startTrack" class="btn">▶ Start tracking</button>
-    <button id="stopTrack" class="btn" disabled>■ Stop</button>
-    <span id="status" class="muted"></span>
-  </div>
-
-  <div id="map">{{map_html|safe}}</div>
-  <a href="{{ url_for('index') }}">⇠ New search</a>
-
-  <script>
-    function findFoliumIframe(){
-      const container = document.getElementById('map');
-      return container ? container.querySelector('iframe') : null;
-    }
-
-    function getIframeLeafletContext(){
-      const iframe = findFoliumIframe();
-      if (!iframe) return null;
-      const iw = iframe.contentWindow;
-      if (!iw) return null;
-      const L = iw.L;
-      if (!L) return null;
-      for (const k of Object.keys(iw)) {
-        try {
-          const v = iw[k];
-          if (k.startsWith('map_') && v && typeof v.setView === 'function' && v instanceof L.Map) {
-            return { map: v, L, win: iw, iframe };
-          }
-        } catch(e){}
-      }
-      return null;
-    }
-
-    async function resolveIframeLeaflet(maxTries=30, intervalMs=150){
-      let tries = 0;
-      return new Promise((resolve)=>{
-        const attempt = ()=>{
-          const ctx = getIframeLeafletContext();
-          if (ctx) return resolve(ctx);
-          tries++;
-          if (tries >= maxTries) return resolve(null);
-          setTimeout(attempt, intervalMs);
-        };
-        attempt();
-      });
-    }
-
-    const startBtn = document.getElementById('startTrack');
-    const stopBtn  = document.getElementById('stopTrack');
-    const statusEl = document.getElementById('status');
-
-    let watchId = null;
-    let ctx = null;
-    let youMarker = null;
-    let accuracyCircle = null;
-
-    function setStatus(msg){ statusEl.textContent = msg; }
+    return _route_json(start, end, nodes, segments, total)
 
-    function ensureHttpsForGeolocation(){
-      const isLocalhost = location.hostname === 'localhost' || location.hostname === '127.0.0.1';
-      const isHttps = location.protocol === 'https:';
-      return isHttps || isLocalhost;
-    }
-
-    function onPosSuccess(pos){
-      if (!ctx) return;
-      const { map, L } = ctx;
-      const lat = pos.coords.latitude;
-      const lon = pos.coords.longitude;
-      const acc = pos.coords.accuracy || 0;
-      const latlng = [lat, lon];
-
-      if (!youMarker) {
-        youMarker = L.circleMarker(latlng, { radius:7, color:'green', fill:true, fillOpacity:1 })
-          .addTo(map).bindPopup('You are here');
-      } else {
-        youMarker.setLatLng(latlng);
-      }
-
-      if (!accuracyCircle) {
-        accuracyCircle = L.circle(latlng, { radius: acc, opacity:0.3, fillOpacity:0.1 }).addTo(map);
-      } else {
-        accuracyCircle.setLatLng(latlng);
-        accuracyCircle.setRadius(acc);
-      }
-
-      setStatus(`GPS: ${lat.toFixed(5)}, ${lon.toFixed(5)} (±${Math.round(acc)} m)`);
-    }
-
-    function onPosError(err){
-      setStatus('Location error: ' + (err && err.message ? err.message : err));
-    }
-
-    async function startTracking(){
-      setStatus('Preparing map…');
-
-      if (!ensureHttpsForGeolocation()){
-        setStatus('Geolocation requires HTTPS (or localhost).');
-        return;
-      }
-
-      ctx = ctx || await resolveIframeLeaflet();
-      if (!ctx || !ctx.map || !ctx.L) {
-        setStatus('Map not ready. Try again in a moment.');
-        return;
-      }
-
-      if (!navigator.geolocation) {
-        setStatus('Geolocation not supported by this browser.');
-        return;
-      }
-
-      watchId = navigator.geolocation.watchPosition(onPosSuccess, onPosError, {
-        enableHighAccuracy: true,
-        maximumAge: 1000,
-        timeout: 10000
-      });
-
-      startBtn.disabled = true;
-      stopBtn.disabled = false;
-      setStatus('Starting GPS…');
-    }
-
-    function stopTracking(){
-      if (watchId !== null) {
-        navigator.geolocation.clearWatch(watchId);
-        watchId = null;
-      }
-      if (ctx && youMarker) { ctx.map.removeLayer(youMarker); youMarker = null; }
-      if (ctx && accuracyCircle) { ctx.map.removeLayer(accuracyCircle); accuracyCircle = null; }
-      startBtn.disabled = false;
-      stopBtn.disabled = true;
-      setStatus('Tracking stopped.');
-    }
-
-    startBtn.addEventListener('click', startTracking);
-    stopBtn.addEventListener('click', stopTracking);
-
-    window.addEventListener('load', async ()=>{
-      const iframe = findFoliumIframe();
-      if (iframe) {
-        iframe.addEventListener('load', () => { ctx = null; });
-      }
-      const maybe = await resolveIframeLeaflet(10, 200);
-      if (maybe) ctx = maybe;
-    });
-
-    try { if (document.title.includes('Your Location')) startTracking(); } catch(e){}
-  </script>
-</body>
-</html>
-"""
-
-TEMPLATE_ADD_NODE = """
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <title>Add Node by Map Click</title>
-  <style>
-    body {font-family:Arial,Helvetica,sans-serif;margin:2rem;}
-    #map {
-      width: 100%;
-      max-width: 1000px;
-      height: 600px;
-      margin-top: 1rem;
-    }
-    .popup {background:#fff;padding:0.5em;border-radius:0.4em;}
-    #msg {margin-top:1em;}
-    @media (max-width: 700px) {
-      #map {
-        width: 100vw;
-        height: 60vw;
-        min-height: 300px;
-        max-width: 100vw;
-      }
-      body {margin:0; padding:0.7em;}
-    }
-  </style>
-  <link rel="stylesheet" href="https://unpkg.com/leaflet/dist/leaflet.css"/>
-</head>
-<body>
-  <h1>Click on map to add nodes and edges.</h1>
-  <a href="{{ url_for('index') }}">⇠ Back to main</a>
-  <div id="map"></div>
-  <div id="msg"></div>
-  <script src="https://unpkg.com/leaflet/dist/leaflet.js"></script>
-<script>
-  var map = L.map('map').setView([{{nodes[0]["lat"]}}, {{nodes[0]["lon"]}}], 19);
-
-  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
-    attribution: '&copy; OpenStreetMap contributors'
-  }).addTo(map);
-
-  var nodes = {{nodes|tojson}};
-  var nodeMarkers = {};
-  nodes.forEach(function(node){
-    var marker = L.circleMarker([node.lat, node.lon], {radius:5, color:'blue'}).addTo(map)
-      .bindPopup(node.label);
-    marker.label = node.label;
-    marker.on('click', function(e){
-      onNodeMarkerClick(marker);
-      e.originalEvent.stopPropagation();
-    });
-    nodeMarkers[node.label] = marker;
-  });
-
-  var edges = {{edges|tojson}};
-  var edgeLayers = [];
-  var selectedEdge = null;
-  var selectedLayer = null;
-  var edgeClickedRecently = false;
-
-  edges.forEach(function(edge){
-    var poly = L.polyline(
-      [[edge.u_lat, edge.u_lon], [edge.v_lat, edge.v_lon]],
-      {color: '#5ec7f8', weight: 2, opacity: 0.5}
-    ).addTo(map);
-    poly.bindTooltip(edge.from + ' \u2192 ' + edge.to, {permanent: false, direction: "auto"});
-    poly.on('click', function(e){
-      selectEdge(edge, poly);
-      edgeClickedRecently = true;
-      e.originalEvent.stopPropagation();
-    });
-    edgeLayers.push({edge: edge, layer: poly});
-  });
-
-  function selectEdge(edge, layer) {
-    if(selectedLayer) {
-      selectedLayer.setStyle({color:'#5ec7f8', weight:2, opacity:0.5});
-    }
-    selectedEdge = edge;
-    selectedLayer = layer;
-    layer.setStyle({color:'orange', weight:4, opacity:0.8});
-    document.getElementById("msg").innerHTML =
-      '<b>Selected edge:</b> ' + edge.from + ' → ' + edge.to +
-      ' <button id="inline-delete-btn" style="margin-left:1em;">Delete</button>';
-    document.getElementById("inline-delete-btn").onclick = function() {
-      if(!selectedEdge) return;
-      if(!confirm("Delete edge " + selectedEdge.from + " → " + selectedEdge.to + "?")) return;
-      fetch("/wayfinding/api/delete_edge", {
-        method: "POST",
-        headers: {"Content-Type":"application/json"},
-        body: JSON.stringify({from:selectedEdge.from, to:selectedEdge.to})
-      })
-      .then(r => r.json())
-      .then(d => {
-        if(d.error) {
-          document.getElementById("msg").innerHTML = '<span style="color:red">'+d.error+'</span>';
-        } else {
-          document.getElementById("msg").innerHTML = '<b>Edge deleted.</b> Reloading...';
-          setTimeout(() => { window.location.reload(); }, 700);
-        }
-      });
-    };
-  }
-
-  var edgeStart = null, edgeEnd = null, edgeLine = null;
-
-  function onNodeMarkerClick(marker) {
-    if (!edgeStart) {
-      edgeStart = marker;
-      marker.setStyle({color:'orange'});
-      document.getElementById("msg").innerHTML = "Start: <b>" + marker.label + "</b>. Now select end node.";
-    } else if (!edgeEnd && marker !== edgeStart) {
-      edgeEnd = marker;
-      marker.setStyle({color:'orange'});
-      edgeLine = L.polyline([edgeStart.getLatLng(), edgeEnd.getLatLng()], {color:'blue', weight:4, dashArray:"6,8"}).addTo(map);
-      var dist = map.distance(edgeStart.getLatLng(), edgeEnd.getLatLng());
-      document.getElementById("msg").innerHTML =
-        "Edge: <b>" + edgeStart.label + "</b> → <b>" + edgeEnd.label + "</b> = " + dist.toFixed(1) + "m " +
-        '<button onclick="saveEdge()">Save Edge</button> <button onclick="cancelEdge()">Cancel</button>';
-    }
-  }
-
-  function saveEdge() {
-    var from = edgeStart.label;
-    var to = edgeEnd.label;
-    // distance is computed server-side; we send just endpoints for convenience
-    fetch("/wayfinding/api/add_edge", {
-      method: "POST",
-      headers: {"Content-Type":"application/json"},
-      body: JSON.stringify({from:from, to:to})
-    })
-    .then(r => r.json())
-    .then(d => {
-      if (d.error) {
-        document.getElementById("msg").innerHTML = '<span style="color:red">' + d.error + '</span>';
-      } else {
-        document.getElementById("msg").innerHTML = "Edge saved: <b>" + from + "</b> → <b>" + to + "</b> (" + (d.result || '') + ")";
-        var poly = L.polyline([edgeStart.getLatLng(), edgeEnd.getLatLng()], {color:'#5ec7f8', weight:2, opacity:0.5}).addTo(map);
-        poly.bindTooltip(from + ' \u2192 ' + to, {permanent: false, direction: "auto"});
-      }
-      resetEdge();
-    });
-  }
-
-  function cancelEdge() {
-    resetEdge();
-    document.getElementById("msg").innerHTML = "Edge creation cancelled.";
-  }
-
-  function resetEdge() {
-    if(edgeStart) edgeStart.setStyle({color:'blue'});
-    if(edgeEnd) edgeEnd.setStyle({color:'blue'});
-    if(edgeLine) map.removeLayer(edgeLine);
-    edgeStart = edgeEnd = edgeLine = null;
-  }
-
-  var lastMarker = null;
-  map.on('click', function(e){
-    if (edgeClickedRecently) {
-      edgeClickedRecently = false;
-      return;
-    }
-    if(lastMarker) map.removeLayer(lastMarker);
-    lastMarker = L.marker(e.latlng).addTo(map);
-    lastMarker.bindPopup(
-      '<div class="popup">'+
-        '<b>Add node here</b><br>Lat: '+e.latlng.lat.toFixed(6)+'<br>Lon: '+e.latlng.lng.toFixed(6)+
-        '<br><input id="nlabel" type="text" value="{{next_label}}" style="width:160px"/><br>'+
-        '<button onclick="saveNode('+e.latlng.lat+','+e.latlng.lng+')">Save Node</button>'+
-      '</div>'
-    ).openPopup();
-  });
-
-  function saveNode(lat, lon){
-    var label = document.getElementById("nlabel").value.trim();
-    if(!label){ alert("Please enter a label/name."); return; }
-    fetch("/wayfinding/api/add_node", {
-      method: "POST",
-      headers: {"Content-Type":"application/json"},
-      body: JSON.stringify({lat:lat, lon:lon, label:label})
-    })
-    .then(r => r.json())
-    .then(d => {
-      if(d.error){
-        document.getElementById("msg").innerHTML = '<span style="color:red">'+d.error+'</span>';
-        return;
-      }
-      document.getElementById("msg").innerHTML = '<b>Added node:</b> '+d.label+'<br>Reloading...';
-      setTimeout(() => { window.location.reload(); }, 600);
-    })
-    .catch(err => {
-      alert("Failed to save node: "+err);
-    });
-  }
-</script>
-</body>
-</html>
-"""
-
-TEMPLATE_ADMIN_LOGIN = """
-<!doctype html>
-<html lang="en">
-<head>
-  <meta charset="utf-8">
-  <title>Admin Login</title>
-  <style>
-    body {font-family: Arial, Helvetica, sans-serif; background:#f7f9fc; margin:0}
-    .box {max-width:420px; margin:8vh auto; background:#fff; padding:1.2em 1.4em; border-radius:1em; box-shadow:0 2px 12px #0001}
-    h1 {font-size:1.4em; margin:0 0 .8em}
-    input[type=password], button {width:100%; font-size:1.1em; padding:.7em; margin:.4em 0}
-    button {background:#0077cc; color:#fff; border:none; border-radius:.5em; cursor:pointer}
-    button:focus, button:active {background:#005fa3}
-    .msg {color:#c00; text-align:center; margin:.5em 0}
-  </style>
-</head>
-<body>
-  <div class="box">
-    <h1>Admin Login</h1>
-    {% with messages = get_flashed_messages() %}
-      {% if messages %}
-        {% for m in messages %}
-          <div class="msg">{{m}}</div>
-        {% endfor %}
-      {% endif %}
-    {% endwith %}
-    <form method="post">
-      <input type="password" name="password" placeholder="Admin password" autocomplete="current-password" required>
-      <button type="submit">Unlock</button>
-    </form>
-    <p><a href="{{ url_for('index') }}">⇠ Back</a></p>
-  </div>
-</body>
-</html>
-"""
 
 # --------------------------------------------------------------------
 # Entrypoint
 # --------------------------------------------------------------------
 if __name__ == "__main__":
+    # Dev server only — single-threaded Werkzeug. Production runs under
+    # gunicorn via wsgi:app (see wayfinding.service / README).
     app.run(debug=False, host="127.0.0.1", port=5555)
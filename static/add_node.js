@@ -0,0 +1,177 @@
+// Admin add-node/add-edge map. The HTML shell only sets NEXT_LABEL and
+// MAP_CENTER; node/edge data comes from the cached GeoJSON endpoint so this
+// file is a plain static asset the browser can cache.
+var map = L.map('map').setView(window.MAP_CENTER, 19);
+
+L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', {
+  attribution: '&copy; OpenStreetMap contributors'
+}).addTo(map);
+
+var nodeMarkers = {};
+var edgeLayers = [];
+var selectedEdge = null;
+var selectedLayer = null;
+var edgeClickedRecently = false;
+
+fetch("/wayfinding/api/graph.geojson")
+  .then(function(r){ return r.json(); })
+  .then(function(fc){
+    fc.features.forEach(function(f){
+      if (f.geometry.type === 'Point') {
+        var c = f.geometry.coordinates;  // [lon, lat]
+        addNodeMarker(f.properties.label, c[1], c[0]);
+      } else if (f.geometry.type === 'LineString') {
+        var cs = f.geometry.coordinates;
+        addEdgeLine({
+          from: f.properties.from, to: f.properties.to,
+          u_lat: cs[0][1], u_lon: cs[0][0], v_lat: cs[1][1], v_lon: cs[1][0]
+        });
+      }
+    });
+  });
+
+function addNodeMarker(label, lat, lon){
+  var marker = L.circleMarker([lat, lon], {radius:5, color:'blue'}).addTo(map)
+    .bindPopup(label);
+  marker.label = label;
+  marker.on('click', function(e){
+    onNodeMarkerClick(marker);
+    e.originalEvent.stopPropagation();
+  });
+  nodeMarkers[label] = marker;
+}
+
+function addEdgeLine(edge){
+  var poly = L.polyline(
+    [[edge.u_lat, edge.u_lon], [edge.v_lat, edge.v_lon]],
+    {color: '#5ec7f8', weight: 2, opacity: 0.5}
+  ).addTo(map);
+  poly.bindTooltip(edge.from + ' → ' + edge.to, {permanent: false, direction: "auto"});
+  poly.on('click', function(e){
+    selectEdge(edge, poly);
+    edgeClickedRecently = true;
+    e.originalEvent.stopPropagation();
+  });
+  edgeLayers.push({edge: edge, layer: poly});
+}
+
+function selectEdge(edge, layer) {
+  if(selectedLayer) {
+    selectedLayer.setStyle({color:'#5ec7f8', weight:2, opacity:0.5});
+  }
+  selectedEdge = edge;
+  selectedLayer = layer;
+  layer.setStyle({color:'orange', weight:4, opacity:0.8});
+  document.getElementById("msg").innerHTML =
+    '<b>Selected edge:</b> ' + edge.from + ' → ' + edge.to +
+    ' <button id="inline-delete-btn" style="margin-left:1em;">Delete</button>';
+  document.getElementById("inline-delete-btn").onclick = function() {
+    if(!selectedEdge) return;
+    if(!confirm("Delete edge " + selectedEdge.from + " → " + selectedEdge.to + "?")) return;
+    fetch("/wayfinding/api/delete_edge", {
+      method: "POST",
+      headers: {"Content-Type":"application/json"},
+      body: JSON.stringify({from:selectedEdge.from, to:selectedEdge.to})
+    })
+    .then(r => r.json())
+    .then(d => {
+      if(d.error) {
+        document.getElementById("msg").innerHTML = '<span style="color:red">'+d.error+'</span>';
+      } else {
+        document.getElementById("msg").innerHTML = '<b>Edge deleted.</b> Reloading...';
+        setTimeout(() => { window.location.reload(); }, 700);
+      }
+    });
+  };
+}
+
+var edgeStart = null, edgeEnd = null, edgeLine = null;
+
+function onNodeMarkerClick(marker) {
+  if (!edgeStart) {
+    edgeStart = marker;
+    marker.setStyle({color:'orange'});
+    document.getElementById("msg").innerHTML = "Start: <b>" + marker.label + "</b>. Now select end node.";
+  } else if (!edgeEnd && marker !== edgeStart) {
+    edgeEnd = marker;
+    marker.setStyle({color:'orange'});
+    edgeLine = L.polyline([edgeStart.getLatLng(), edgeEnd.getLatLng()], {color:'blue', weight:4, dashArray:"6,8"}).addTo(map);
+    var dist = map.distance(edgeStart.getLatLng(), edgeEnd.getLatLng());
+    document.getElementById("msg").innerHTML =
+      "Edge: <b>" + edgeStart.label + "</b> → <b>" + edgeEnd.label + "</b> = " + dist.toFixed(1) + "m " +
+      '<button onclick="saveEdge()">Save Edge</button> <button onclick="cancelEdge()">Cancel</button>';
+  }
+}
+
+function saveEdge() {
+  var from = edgeStart.label;
+  var to = edgeEnd.label;
+  // distance is computed server-side; we send just endpoints for convenience
+  fetch("/wayfinding/api/add_edge", {
+    method: "POST",
+    headers: {"Content-Type":"application/json"},
+    body: JSON.stringify({from:from, to:to})
+  })
+  .then(r => r.json())
+  .then(d => {
+    if (d.error) {
+      document.getElementById("msg").innerHTML = '<span style="color:red">' + d.error + '</span>';
+    } else {
+      document.getElementById("msg").innerHTML = "Edge saved: <b>" + from + "</b> → <b>" + to + "</b> (" + (d.result || '') + ")";
+      var poly = L.polyline([edgeStart.getLatLng(), edgeEnd.getLatLng()], {color:'#5ec7f8', weight:2, opacity:0.5}).addTo(map);
+      poly.bindTooltip(from + ' → ' + to, {permanent: false, direction: "auto"});
+    }
+    resetEdge();
+  });
+}
+
+function cancelEdge() {
+  resetEdge();
+  document.getElementById("msg").innerHTML = "Edge creation cancelled.";
+}
+
+function resetEdge() {
+  if(edgeStart) edgeStart.setStyle({color:'blue'});
+  if(edgeEnd) edgeEnd.setStyle({color:'blue'});
+  if(edgeLine) map.removeLayer(edgeLine);
+  edgeStart = edgeEnd = edgeLine = null;
+}
+
+var lastMarker = null;
+map.on('click', function(e){
+  if (edgeClickedRecently) {
+    edgeClickedRecently = false;
+    return;
+  }
+  if(lastMarker) map.removeLayer(lastMarker);
+  lastMarker = L.marker(e.latlng).addTo(map);
+  lastMarker.bindPopup(
+    '<div class="popup">'+
+      '<b>Add node here</b><br>Lat: '+e.latlng.lat.toFixed(6)+'<br>Lon: '+e.latlng.lng.toFixed(6)+
+      '<br><input id="nlabel" type="text" value="'+window.NEXT_LABEL+'" style="width:160px"/><br>'+
+      '<button onclick="saveNode('+e.latlng.lat+','+e.latlng.lng+')">Save Node</button>'+
+    '</div>'
+  ).openPopup();
+});
+
+function saveNode(lat, lon){
+  var label = document.getElementById("nlabel").value.trim();
+  if(!label){ alert("Please enter a label/name."); return; }
+  fetch("/wayfinding/api/add_node", {
+    method: "POST",
+    headers: {"Content-Type":"application/json"},
+    body: JSON.stringify({lat:lat, lon:lon, label:label})
+  })
+  .then(r => r.json())
+  .then(d => {
+    if(d.error){
+      document.getElementById("msg").innerHTML = '<span style="color:red">'+d.error+'</span>';
+      return;
+    }
+    document.getElementById("msg").innerHTML = '<b>Added node:</b> '+d.label+'<br>Reloading...';
+    setTimeout(() => { window.location.reload(); }, 600);
+  })
+  .catch(err => {
+    alert("Failed to save node: "+err);
+  });
+}